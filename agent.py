@@ -2,37 +2,301 @@
 Homeric AI Agent - Answers questions in lyrical verse inspired by Homer
 """
 
-from typing import List, Dict, Any, Optional, Literal
+from typing import Callable, List, Dict, Any, Optional, Literal
+from cachetools import LFUCache
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import timedelta
 from pydantic import BaseModel, Field
-import google.generativeai as genai
+import httpx
+import functools
+import importlib.util
 import os
+import re
+import sys
+import threading
 from dotenv import load_dotenv
 
 load_dotenv()
 
 
+def _lazy_import(name: str):
+    """
+    Import a module lazily: its body runs on first attribute access, not here.
+
+    Used for google.generativeai, whose import costs hundreds of ms and tens
+    of MB of RSS that would otherwise be paid when Streamlit first loads
+    app.py, before any agent exists.
+    """
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+genai = _lazy_import("google.generativeai")
+
+
+_WIKI_API_URL = "https://en.wikipedia.org/w/api.php"
+
+# Sentence boundary for truncating article extracts, compiled once at import
+_SENT_RE = re.compile(r"(?<=[.!?])\s+")
+
+# Cache of formatted summaries keyed by normalized query. LFU eviction:
+# mythology queries are heavily skewed toward a few hot topics, and under
+# LRU a burst of one-off questions would evict them. Guarded by a lock
+# since batched lookups populate it from worker threads.
+_WIKI_CACHE: "LFUCache[str, str]" = LFUCache(maxsize=2048)
+_WIKI_CACHE_LOCK = threading.Lock()
+
+
+def _wiki_cache_get(key: str) -> Optional[str]:
+    """Return a cached summary (counting the use), or None on miss"""
+    with _WIKI_CACHE_LOCK:
+        return _WIKI_CACHE.get(key)
+
+
+def _wiki_cache_put(key: str, value: str):
+    """Store a summary, evicting the least frequently used entry when full"""
+    with _WIKI_CACHE_LOCK:
+        _WIKI_CACHE[key] = value
+
+
+_WIKI = httpx.Client(
+    http2=True,
+    timeout=5,
+    headers={"User-Agent": "HomerAgent/1.0"},
+)
+
+
+def _fetch_json(params: Dict[str, Any]) -> Any:
+    """Fetch a JSON document from the MediaWiki API over the pooled client"""
+    resp = _WIKI.get(_WIKI_API_URL, params=params)
+    resp.raise_for_status()
+    return resp.json()
+
+
+def _search_titles(query: str) -> List[str]:
+    """Search Wikipedia for page titles matching the query"""
+    data = _fetch_json({
+        "action": "opensearch",
+        "search": query,
+        "limit": 3,
+        "namespace": 0,
+        "format": "json",
+    })
+    return data[1] if len(data) > 1 else []
+
+
+def _fetch_summary(title: str) -> Optional[str]:
+    """
+    Fetch the intro extract of a Wikipedia page, truncated to 5 sentences.
+
+    Returns None for disambiguation pages — their "X may refer to:" stub is
+    a valid extract but useless as an article summary — so callers fall
+    through to the next candidate title.
+    """
+    data = _fetch_json({
+        "action": "query",
+        "prop": "extracts|pageprops",
+        "ppprop": "disambiguation",
+        "exintro": 1,
+        "explaintext": 1,
+        "redirects": 1,
+        "titles": title,
+        "format": "json",
+    })
+    pages = data.get("query", {}).get("pages", {})
+    for page in pages.values():
+        if "disambiguation" in page.get("pageprops", {}):
+            continue
+        extract = page.get("extract")
+        if extract:
+            sentences = _SENT_RE.split(extract)
+            return " ".join(sentences[:5])
+    return None
+
+
+def _first_available_summary(titles: List[str]) -> "tuple[Optional[str], Optional[str]]":
+    """
+    Fetch candidate summaries concurrently and return (title, summary) for
+    the first page that has one, so the fallback costs one round trip
+    instead of one per candidate.
+    """
+    with ThreadPoolExecutor(max_workers=len(titles)) as executor:
+        futures = {executor.submit(_fetch_summary, title): title for title in titles}
+        for future in as_completed(futures):
+            try:
+                summary = future.result()
+            except Exception:
+                continue
+            if summary:
+                return futures[future], summary
+    return None, None
+
+
+def _search_wikipedia_one(query: str) -> str:
+    """
+    Search Wikipedia and return a formatted summary for a normalized query.
+
+    Checks the in-memory cache first so repeated questions (common in chat
+    sessions) skip the network round-trips entirely.
+    """
+    cached = _wiki_cache_get(query)
+    if cached is not None:
+        return cached
+
+    try:
+        titles = _search_titles(query)
+
+        if not titles:
+            return f"No results found for '{query}' on Wikipedia."
+
+        title = titles[0]
+        summary = _fetch_summary(title)
+        if summary is None and len(titles) > 1:
+            # Try the remaining candidates in parallel (e.g. the top hit is
+            # a disambiguation page)
+            title, summary = _first_available_summary(titles[1:])
+        if summary is None:
+            return f"Could not retrieve page for '{query}'. Top results: {', '.join(titles)}"
+
+        result = f"Wikipedia article on '{title}':\n\n{summary}"
+        _wiki_cache_put(query, result)
+        return result
+
+    except Exception as e:
+        return f"Error searching Wikipedia: {str(e)}"
+
+
+def _run_searches(queries: List[str]) -> List[str]:
+    """Resolve one or more queries, overlapping network waits when batched"""
+    if len(queries) == 1:
+        return [_search_wikipedia_one(queries[0])]
+    with ThreadPoolExecutor(max_workers=min(8, len(queries))) as executor:
+        return list(executor.map(_search_wikipedia_one, queries))
+
+
+# Inputs answered with a canned verse, skipping the LLM + Wikipedia round
+# trip entirely: bare greetings, empty input, and clearly unsafe requests
+_TRIVIAL_GREETINGS = frozenset({
+    "hi", "hello", "hey", "greetings", "good day", "χαίρε", "chaire",
+})
+
+# Only unambiguous terms: words like "weapon" or "exploit" are everyday
+# vocabulary for mythology questions and must reach the model
+_UNSAFE_RE = re.compile(
+    r"\b(malware|ransomware|nerve agent|bioweapon)s?\b",
+    re.IGNORECASE,
+)
+
+_GREETING_VERSE = """O mortal, welcome to my humble hall of song!
+Speak now thy question, and I shall not keep thee long.
+Ask of gods or heroes, of stars or earthly lore,
+And I shall sing the answer, as bards have sung before."""
+
+_REFUSAL_VERSE = """O seeker, turn thy footsteps from this shadowed way,
+For even wise Athena would bid thee not to stray.
+Such dark and harmful knowledge no honest bard will sing;
+Ask instead of nobler things, and verses I shall bring."""
+
+
+@functools.cache
+def _build_tool() -> "genai.protos.Tool":
+    """
+    Build the Wikipedia search tool declaration for Gemini.
+
+    Cached at module level so the protobuf Schema/FunctionDeclaration
+    objects are constructed once per process rather than per agent
+    (each Streamlit session creates its own agent).
+    """
+    search_wikipedia_declaration = genai.protos.FunctionDeclaration(
+        name="search_wikipedia",
+        description="Search Wikipedia for information to help answer questions. Use this to find factual information about any topic, especially Greek mythology, history, or other subjects.",
+        parameters=genai.protos.Schema(
+            type=genai.protos.Type.OBJECT,
+            properties={
+                "query": genai.protos.Schema(
+                    type=genai.protos.Type.STRING,
+                    description="The search query to look up on Wikipedia"
+                )
+            },
+            required=["query"]
+        )
+    )
+    return genai.protos.Tool(function_declarations=[search_wikipedia_declaration])
+
+
 class ToolInput(BaseModel):
     """Input schema for tool calls"""
     query: str = Field(..., description="The search query for Wikipedia")
 
 
-class Message(BaseModel):
-    """Pydantic model for chat messages"""
+@dataclass(slots=True)
+class Message:
+    """A chat message; a plain slotted dataclass so the per-turn hot path
+    skips Pydantic validation and per-instance dicts"""
     role: Literal["user", "model"]
     content: str
 
 
-class ConversationHistory(BaseModel):
-    """Pydantic model for conversation history"""
-    messages: List[Message] = Field(default_factory=list)
+@dataclass(slots=True)
+class ConversationHistory:
+    """Conversation state: verbatim messages, rolling summary, Gemini mirror"""
+    messages: List[Message] = field(default_factory=list)
+    window_size: int = 8  # Turns kept verbatim; older ones fold into summary
+    summary: str = ""
+
+    # Gemini-format mirror of messages, appended to in add_message so
+    # get_gemini_history doesn't rebuild an O(N) list of dicts per call
+    _gemini: List[Dict[str, Any]] = field(default_factory=list)
+    _summarizer: Optional[Callable[[str], str]] = None
+
+    def set_summarizer(self, summarizer: Callable[[str], str]):
+        """Install the callable used to compress turns that leave the window"""
+        self._summarizer = summarizer
 
     def add_message(self, role: str, content: str):
         """Add a message to the conversation history"""
         self.messages.append(Message(role=role, content=content))
+        self._gemini.append({"role": role, "parts": [content]})
+        self._compress()
+
+    def _compress(self):
+        """
+        Fold the oldest messages into the rolling summary once the verbatim
+        window is exceeded, keeping the history sent to Gemini bounded.
+        """
+        if self._summarizer is None:
+            return
+
+        while len(self.messages) > 2 * self.window_size:
+            evicted = self.messages[:2]
+            excerpt = "\n".join(f"{msg.role}: {msg.content}" for msg in evicted)
+            if self.summary:
+                excerpt = f"{self.summary}\n{excerpt}"
+            try:
+                self.summary = self._summarizer(excerpt)
+            except Exception:
+                # Keep the turns verbatim rather than losing them
+                break
+            del self.messages[:2]
+            del self._gemini[:2]
+
+    def clear(self):
+        """Empty the history in place, keeping the lists and summarizer"""
+        self.messages.clear()
+        self._gemini.clear()
+        self.summary = ""
 
     def get_gemini_history(self) -> List[Dict[str, Any]]:
-        """Convert messages to Gemini API format"""
-        return [{"role": msg.role, "parts": [msg.content]} for msg in self.messages]
+        """Return the messages in Gemini API format, prefixed by the summary"""
+        if self.summary:
+            return [{"role": "user", "parts": [f"Prior tale, retold in brief: {self.summary}"]}] + self._gemini
+        return self._gemini
 
 
 class HomericAgent:
@@ -77,59 +341,47 @@ Remember: EVERY response must be in verse, and you must use the Wikipedia functi
         # Configure Gemini API
         genai.configure(api_key=self.api_key)
 
-        # Define Wikipedia search tool for Gemini
-        self.search_wikipedia_declaration = genai.protos.FunctionDeclaration(
-            name="search_wikipedia",
-            description="Search Wikipedia for information to help answer questions. Use this to find factual information about any topic, especially Greek mythology, history, or other subjects.",
-            parameters=genai.protos.Schema(
-                type=genai.protos.Type.OBJECT,
-                properties={
-                    "query": genai.protos.Schema(
-                        type=genai.protos.Type.STRING,
-                        description="The search query to look up on Wikipedia"
-                    )
-                },
-                required=["query"]
-            )
-        )
+        # Wikipedia search tool for Gemini (shared across agents)
+        tools = [_build_tool()]
 
-        # Create the model with tools
-        self.model = genai.GenerativeModel(
-            model_name="gemini-2.5-flash",
-            system_instruction=self.SYSTEM_PROMPT,
-            tools=[genai.protos.Tool(function_declarations=[self.search_wikipedia_declaration])]
-        )
+        # Cache the static system prompt + tool schema server-side so each
+        # turn references them by handle instead of paying their prefill
+        # tokens again. Falls back to inline instructions if the caching
+        # API is unavailable (e.g. prompt below the model's cache minimum).
+        self.cache = None
+        try:
+            self.cache = genai.caching.CachedContent.create(
+                model="gemini-2.5-flash",
+                system_instruction=self.SYSTEM_PROMPT,
+                tools=tools,
+                ttl=timedelta(hours=1),
+            )
+            self.model = genai.GenerativeModel.from_cached_content(cached_content=self.cache)
+        except Exception:
+            self.model = genai.GenerativeModel(
+                model_name="gemini-2.5-flash",
+                system_instruction=self.SYSTEM_PROMPT,
+                tools=tools
+            )
 
         self.conversation = ConversationHistory()
+        self.conversation.set_summarizer(self._summarize_history)
         self.chat_session = None
+        self._summary_model = None
+
+    def _summarize_history(self, text: str) -> str:
+        """Compress old conversation turns into two lines of Homeric verse"""
+        if self._summary_model is None:
+            self._summary_model = genai.GenerativeModel(model_name="gemini-2.5-flash-lite")
+        response = self._summary_model.generate_content(
+            "Compress this chat excerpt into at most 2 lines of Homeric verse, "
+            f"preserving the key facts:\n{text}"
+        )
+        return response.text.strip()
 
     def search_wikipedia(self, query: str) -> str:
-        """Search Wikipedia and return relevant content"""
-        import wikipedia
-
-        try:
-            # Search for pages
-            search_results = wikipedia.search(query, results=3)
-
-            if not search_results:
-                return f"No results found for '{query}' on Wikipedia."
-
-            # Get summary of the first result
-            try:
-                summary = wikipedia.summary(search_results[0], sentences=5, auto_suggest=False)
-                return f"Wikipedia article on '{search_results[0]}':\n\n{summary}"
-            except wikipedia.exceptions.DisambiguationError as e:
-                # If disambiguation, try the first option
-                try:
-                    summary = wikipedia.summary(e.options[0], sentences=5, auto_suggest=False)
-                    return f"Wikipedia article on '{e.options[0]}':\n\n{summary}"
-                except:
-                    return f"Found multiple articles. Top results: {', '.join(search_results[:3])}"
-            except wikipedia.exceptions.PageError:
-                return f"Could not retrieve page for '{query}'."
-
-        except Exception as e:
-            return f"Error searching Wikipedia: {str(e)}"
+        """Search Wikipedia and return relevant content (cached per normalized query)"""
+        return _run_searches([query.lower().strip()])[0]
 
     def process_tool_call(self, function_name: str, function_args: Dict[str, Any]) -> str:
         """Process a function call and return the result"""
@@ -139,11 +391,69 @@ Remember: EVERY response must be in verse, and you must use the Wikipedia functi
         else:
             return f"Unknown function: {function_name}"
 
+    def process_tool_calls(self, calls: List[Any]) -> List[str]:
+        """
+        Process a batch of function calls and return their results in order.
+
+        Wikipedia lookups are resolved concurrently over one session, so a
+        turn with several searches costs one round trip instead of N.
+        """
+        results: List[Optional[str]] = [None] * len(calls)
+        wiki_indices: List[int] = []
+        wiki_queries: List[str] = []
+
+        for i, call in enumerate(calls):
+            if call.name == "search_wikipedia":
+                wiki_indices.append(i)
+                # call.args is a protobuf MapComposite; read the field
+                # directly instead of materializing a dict per call
+                wiki_queries.append(call.args.get("query", "").lower().strip())
+            else:
+                results[i] = f"Unknown function: {call.name}"
+
+        if wiki_queries:
+            for i, result in zip(wiki_indices, _run_searches(wiki_queries)):
+                results[i] = result
+
+        return results
+
+    @staticmethod
+    def _function_responses(calls: List[Any], results: List[str]) -> "genai.protos.Content":
+        """Pack tool results into a single multi-part Content message"""
+        return genai.protos.Content(
+            parts=[
+                genai.protos.Part(
+                    function_response=genai.protos.FunctionResponse(
+                        name=call.name,
+                        response={"result": result}
+                    )
+                )
+                for call, result in zip(calls, results)
+            ]
+        )
+
+    @staticmethod
+    def _canned_response(user_message: str) -> Optional[str]:
+        """Return a canned verse for inputs that don't warrant the model"""
+        stripped = user_message.strip()
+        if not stripped or stripped.lower().rstrip("!.,") in _TRIVIAL_GREETINGS:
+            return _GREETING_VERSE
+        if _UNSAFE_RE.search(stripped):
+            return _REFUSAL_VERSE
+        return None
+
     def chat(self, user_message: str) -> str:
         """
         Send a message to the agent and get a response.
         Handles function calls automatically.
         """
+        # Answer trivial or unsafe input without touching the API
+        canned = self._canned_response(user_message)
+        if canned is not None:
+            self.conversation.add_message("user", user_message)
+            self.conversation.add_message("model", canned)
+            return canned
+
         # Initialize or continue chat session
         if self.chat_session is None:
             self.chat_session = self.model.start_chat(history=self.conversation.get_gemini_history())
@@ -157,47 +467,31 @@ Remember: EVERY response must be in verse, and you must use the Wikipedia functi
 
         # Check if response has function calls
         while iteration < max_iterations:
-            # Check if the first part has a function call
+            # Collect every function call in the response, not just the first
             parts = response.candidates[0].content.parts
-            if not parts:
-                break
-
-            first_part = parts[0]
-            # Check if this part is a function call
-            if not hasattr(first_part, 'function_call') or not first_part.function_call.name:
+            calls = [
+                part.function_call for part in parts
+                if getattr(part, 'function_call', None) and part.function_call.name
+            ]
+            if not calls:
                 break
 
             iteration += 1
 
-            # Extract function call
-            function_call = first_part.function_call
-            function_name = function_call.name
-            function_args = dict(function_call.args)
-
-            # Execute function
-            function_result = self.process_tool_call(function_name, function_args)
-
-            # Send function response back
-            response = self.chat_session.send_message(
-                genai.protos.Content(
-                    parts=[genai.protos.Part(
-                        function_response=genai.protos.FunctionResponse(
-                            name=function_name,
-                            response={"result": function_result}
-                        )
-                    )]
-                )
-            )
+            # Execute all calls (Wikipedia lookups run concurrently) and
+            # answer them in a single round trip
+            results = self.process_tool_calls(calls)
+            response = self.chat_session.send_message(self._function_responses(calls, results))
 
         # Extract final text response
-        final_text = ""
         try:
             final_text = response.text
         except ValueError:
             # If response.text fails, manually extract text from parts
-            for part in response.candidates[0].content.parts:
-                if hasattr(part, 'text') and part.text:
-                    final_text += part.text
+            final_text = "".join(
+                part.text for part in response.candidates[0].content.parts
+                if getattr(part, 'text', None)
+            )
 
         # Update conversation history (Gemini chat keeps its own history)
         # We just need to track it for potential resets
@@ -206,7 +500,71 @@ Remember: EVERY response must be in verse, and you must use the Wikipedia functi
 
         return final_text
 
+    def chat_stream(self, user_message: str):
+        """
+        Send a message to the agent and yield the response text chunk by chunk.
+
+        Handles function calls automatically; tool-call iterations are resolved
+        between streams, so only the actual verse is yielded and the first
+        tokens appear as soon as the model starts the final response.
+        """
+        # Answer trivial or unsafe input without touching the API
+        canned = self._canned_response(user_message)
+        if canned is not None:
+            self.conversation.add_message("user", user_message)
+            self.conversation.add_message("model", canned)
+            yield canned
+            return
+
+        # Initialize or continue chat session
+        if self.chat_session is None:
+            self.chat_session = self.model.start_chat(history=self.conversation.get_gemini_history())
+
+        response = self.chat_session.send_message(user_message, stream=True)
+
+        max_iterations = 5  # Prevent infinite loops
+        iteration = 0
+        text_chunks = []
+
+        while True:
+            calls = []
+
+            # Yield text as it arrives; remember any function calls for after
+            # the stream is exhausted
+            for chunk in response:
+                for part in chunk.candidates[0].content.parts:
+                    if hasattr(part, 'function_call') and part.function_call.name:
+                        calls.append(part.function_call)
+                    elif getattr(part, 'text', None):
+                        text_chunks.append(part.text)
+                        yield part.text
+
+            # Stop before sending a request this loop would not drain: an
+            # unconsumed stream leaves the chat session unusable
+            if not calls or iteration >= max_iterations:
+                break
+
+            iteration += 1
+
+            # Execute all calls and stream the follow-up response
+            results = self.process_tool_calls(calls)
+            response = self.chat_session.send_message(
+                self._function_responses(calls, results),
+                stream=True
+            )
+
+        # Update conversation history (Gemini chat keeps its own history)
+        self.conversation.add_message("user", user_message)
+        self.conversation.add_message("model", "".join(text_chunks))
+
     def reset_conversation(self):
         """Reset the conversation history"""
-        self.conversation = ConversationHistory()
+        self.conversation.clear()
         self.chat_session = None
+
+        # Keep the cached system prompt alive for the next conversation
+        if self.cache is not None:
+            try:
+                self.cache.update(ttl=timedelta(hours=1))
+            except Exception:
+                self.cache = None
@@ -15,7 +15,10 @@ st.set_page_config(
 )
 
 # Custom CSS for a more classical Greek aesthetic
-st.markdown("""
+@st.cache_resource
+def _page_css() -> str:
+    """Static stylesheet, built once per process instead of per rerun"""
+    return """
     <style>
     .main {
         background-color: #f5f5dc;
@@ -63,7 +66,10 @@ st.markdown("""
         line-height: 1.8;
     }
     </style>
-    """, unsafe_allow_html=True)
+    """
+
+
+st.markdown(_page_css(), unsafe_allow_html=True)
 
 # Initialize session state
 if "agent" not in st.session_state:
@@ -74,8 +80,22 @@ if "api_key_set" not in st.session_state:
     st.session_state.api_key_set = False
 
 
+@st.cache_data(max_entries=2048)
+def render_message(role: str, content: str) -> str:
+    """Render a chat message as styled HTML, memoized across reruns"""
+    if role == "user":
+        return f'<div class="user-message">🧑 <strong>You:</strong><br>{content}</div>'
+    return f'<div class="assistant-message">🏛️ <strong>Homer:</strong><br>{content}</div>'
+
+
 def initialize_agent(api_key: str):
-    """Initialize the Homeric agent"""
+    """Initialize the Homeric agent, reusing the live one when possible"""
+    # Re-clicking "Initialize" with the same key would discard the chat
+    # session and force the full history to be re-sent; keep the live agent
+    if st.session_state.agent is not None and st.session_state.agent.api_key == api_key:
+        st.session_state.api_key_set = True
+        return True
+
     try:
         st.session_state.agent = HomericAgent(api_key=api_key)
         st.session_state.api_key_set = True
@@ -160,16 +180,7 @@ if not st.session_state.api_key_set:
 else:
     # Display chat messages
     for message in st.session_state.messages:
-        if message["role"] == "user":
-            st.markdown(
-                f'<div class="user-message">🧑 <strong>You:</strong><br>{message["content"]}</div>',
-                unsafe_allow_html=True
-            )
-        else:
-            st.markdown(
-                f'<div class="assistant-message">🏛️ <strong>Homer:</strong><br>{message["content"]}</div>',
-                unsafe_allow_html=True
-            )
+        st.markdown(render_message(message["role"], message["content"]), unsafe_allow_html=True)
 
     # Chat input
     user_input = st.chat_input("Ask Homer your question, O seeker of wisdom...")
@@ -179,30 +190,21 @@ else:
         st.session_state.messages.append({"role": "user", "content": user_input})
 
         # Display user message
-        st.markdown(
-            f'<div class="user-message">🧑 <strong>You:</strong><br>{user_input}</div>',
-            unsafe_allow_html=True
-        )
-
-        # Get response from agent
-        with st.spinner("🌟 Homer consults the Muses and the sacred scrolls..."):
-            try:
-                response = st.session_state.agent.chat(user_input)
-
-                # Add assistant message to chat
-                st.session_state.messages.append({"role": "assistant", "content": response})
-
-                # Display assistant message
-                st.markdown(
-                    f'<div class="assistant-message">🏛️ <strong>Homer:</strong><br>{response}</div>',
-                    unsafe_allow_html=True
-                )
-
-                # Force a rerun to update the chat display properly
-                st.rerun()
-
-            except Exception as e:
-                st.error(f"⚠️ The gods are displeased! Error: {str(e)}")
+        st.markdown(render_message("user", user_input), unsafe_allow_html=True)
+
+        # Stream the response from the agent so verses appear as they are sung
+        try:
+            with st.chat_message("assistant", avatar="🏛️"):
+                response = st.write_stream(st.session_state.agent.chat_stream(user_input))
+
+            # Add assistant message to chat
+            st.session_state.messages.append({"role": "assistant", "content": response})
+
+            # Force a rerun to update the chat display properly
+            st.rerun()
+
+        except Exception as e:
+            st.error(f"⚠️ The gods are displeased! Error: {str(e)}")
 
 # Footer
 st.markdown("---")